@@ -1,13 +1,14 @@
 from .command_handler import CommandHandler
 from .config_manager import ConfigManager
 from .log_cleaner import LogCleaner
-from .log_handler import LogPlusHandler
+from .log_handler import LogPlusHandler, LogPlusQueueHandler
 from .log_router import LogRouter
 from .sensitive_filter import SensitiveFilter
 
 __all__ = [
     "ConfigManager",
     "LogPlusHandler",
+    "LogPlusQueueHandler",
     "LogRouter",
     "LogCleaner",
     "SensitiveFilter",
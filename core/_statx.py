@@ -0,0 +1,95 @@
+import ctypes
+import errno
+import functools
+import os
+import sys
+
+AT_FDCWD = -100
+AT_STATX_DONT_SYNC = 0x4000
+STATX_MTIME = 0x40
+STATX_SIZE = 0x200
+_STATX_MASK = STATX_SIZE | STATX_MTIME
+
+
+class _StatxTimestamp(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_int64),
+        ("tv_nsec", ctypes.c_uint32),
+        ("_reserved", ctypes.c_int32),
+    ]
+
+
+class _Statx(ctypes.Structure):
+    """struct statx (linux/stat.h)，共 256 字节"""
+
+    _fields_ = [
+        ("stx_mask", ctypes.c_uint32),
+        ("stx_blksize", ctypes.c_uint32),
+        ("stx_attributes", ctypes.c_uint64),
+        ("stx_nlink", ctypes.c_uint32),
+        ("stx_uid", ctypes.c_uint32),
+        ("stx_gid", ctypes.c_uint32),
+        ("stx_mode", ctypes.c_uint16),
+        ("_spare0", ctypes.c_uint16),
+        ("stx_ino", ctypes.c_uint64),
+        ("stx_size", ctypes.c_uint64),
+        ("stx_blocks", ctypes.c_uint64),
+        ("stx_attributes_mask", ctypes.c_uint64),
+        ("stx_atime", _StatxTimestamp),
+        ("stx_btime", _StatxTimestamp),
+        ("stx_ctime", _StatxTimestamp),
+        ("stx_mtime", _StatxTimestamp),
+        ("_spare", ctypes.c_uint8 * 128),
+    ]
+
+
+@functools.cache
+def _load_statx():
+    """加载 glibc 的 statx，不可用时返回 None
+
+    非 Linux、glibc < 2.28、内核 < 4.11，或容器 seccomp 策略拒绝 statx
+    （返回 EPERM 等）时均视为不可用。
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        func = ctypes.CDLL(None, use_errno=True).statx
+    except (OSError, AttributeError):
+        return None
+
+    func.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_uint,
+        ctypes.POINTER(_Statx),
+    ]
+    func.restype = ctypes.c_int
+
+    buf = _Statx()
+    if func(AT_FDCWD, b"/", AT_STATX_DONT_SYNC, _STATX_MASK, ctypes.byref(buf)):
+        return None
+    return func
+
+
+def fast_stat(path: bytes) -> tuple[int, float]:
+    """获取文件的 (size, mtime)
+
+    Linux 上使用 statx(AT_STATX_DONT_SYNC) 只请求大小和修改时间，
+    允许直接使用内核缓存的属性；其他平台回退到 os.stat。
+    """
+    func = _load_statx()
+    if func is None:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+
+    buf = _Statx()
+    if func(AT_FDCWD, path, AT_STATX_DONT_SYNC, _STATX_MASK, ctypes.byref(buf)):
+        err = ctypes.get_errno()
+        if err in (errno.ENOENT, errno.ENOTDIR):
+            raise OSError(err, os.strerror(err), os.fsdecode(path))
+        # 其他错误（如个别路径上 statx 被拒绝）回退到 os.stat
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    mtime = buf.stx_mtime
+    return buf.stx_size, mtime.tv_sec + mtime.tv_nsec / 1e9
@@ -0,0 +1,61 @@
+import gzip
+import os
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 流式压缩时的读写缓冲区大小
+_COPY_BUFSIZE = 1024 * 1024
+# 超过该大小的文件改为流式压缩，避免一次性读入内存
+_ONE_SHOT_MAX_SIZE = 200 * 1024 * 1024
+# 各算法支持的压缩级别范围
+_LEVEL_RANGES = {"gzip": (0, 9), "zstd": (1, 22)}
+
+
+def resolve_algo(algo: str, level: int) -> tuple[str, str, int]:
+    """返回实际可用的(压缩算法, 文件后缀, 压缩级别)
+
+    未安装 zstandard 时回退到 gzip；级别截断到所选算法的范围内，
+    避免为 zstd 配置的级别（如 19）在回退到 gzip 后导致压缩失败。
+    """
+    if algo == "zstd" and zstandard is not None:
+        algo, suffix = "zstd", ".zst"
+    else:
+        algo, suffix = "gzip", ".gz"
+    low, high = _LEVEL_RANGES[algo]
+    return algo, suffix, max(low, min(high, level))
+
+
+def compress_file(
+    src,
+    dst,
+    algo: str = "gzip",
+    level: int = 9,
+    one_shot_limit: int = _ONE_SHOT_MAX_SIZE,
+):
+    """压缩 src 到 dst 并删除 src
+
+    不超过 one_shot_limit 的文件一次性读入并压缩后一次写出，
+    省去 GzipFile 逐块写入的 Python 层开销；更大的文件流式压缩。
+    """
+    with open(src, "rb") as f_in:
+        if os.fstat(f_in.fileno()).st_size <= one_shot_limit:
+            data = f_in.read()
+            if algo == "zstd":
+                data = zstandard.ZstdCompressor(level=level).compress(data)
+            else:
+                data = gzip.compress(data, compresslevel=level)
+            with open(dst, "wb") as f_out:
+                f_out.write(data)
+        elif algo == "zstd":
+            with open(dst, "wb") as f_out:
+                zstandard.ZstdCompressor(level=level).copy_stream(
+                    f_in, f_out, read_size=_COPY_BUFSIZE, write_size=_COPY_BUFSIZE
+                )
+        else:
+            with gzip.open(dst, "wb", compresslevel=level) as f_out:
+                shutil.copyfileobj(f_in, f_out, length=_COPY_BUFSIZE)
+    os.remove(src)
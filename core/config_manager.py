@@ -1,5 +1,8 @@
+import re
 from typing import Any
 
+from .sensitive_filter import SensitiveFilter
+
 
 class ConfigManager:
     """配置管理器"""
@@ -16,37 +19,52 @@ class ConfigManager:
         "enable_plugin_separation": True,
         "enable_compression": True,
         "compression_after_days": 1,
+        "compression_algo": "gzip",
+        "compression_level": 1,
         "auto_clean_enabled": True,
         "max_total_size_mb": 500,
         "max_age_days": 30,
+        "export_compress_level": 1,
         "enable_sensitive_filter": True,
         "sensitive_keywords": "token,password,secret,api_key,apikey,access_key,accesskey",
     }
 
     def __init__(self, config: dict):
         self._config = config or {}
+        # 默认值与用户配置预先合并，get 只需一次字典查找
+        self._merged = {**self.DEFAULTS, **self._config}
+        self._sensitive_keywords: list[str] | None = None
+        self._sensitive_matcher: re.Pattern | None = None
 
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置值，支持默认值"""
-        if key in self._config:
-            return self._config[key]
-        if key in self.DEFAULTS:
-            return self.DEFAULTS[key]
-        return default
+        return self._merged.get(key, default)
 
     def get_sensitive_keywords(self) -> list[str]:
         """获取敏感词列表"""
-        keywords_str = self.get("sensitive_keywords", "")
-        if isinstance(keywords_str, str):
-            return [k.strip() for k in keywords_str.split(",") if k.strip()]
-        return keywords_str if isinstance(keywords_str, list) else []
+        if self._sensitive_keywords is None:
+            keywords_str = self.get("sensitive_keywords", "")
+            if isinstance(keywords_str, str):
+                keywords = [k.strip() for k in keywords_str.split(",") if k.strip()]
+            else:
+                keywords = keywords_str if isinstance(keywords_str, list) else []
+            self._sensitive_keywords = keywords
+        return self._sensitive_keywords
+
+    def get_sensitive_matcher(self) -> re.Pattern:
+        """获取匹配任一敏感词的预编译正则"""
+        if self._sensitive_matcher is None:
+            keywords = self.get_sensitive_keywords() or SensitiveFilter.DEFAULT_KEYWORDS
+            self._sensitive_matcher = SensitiveFilter.compile_matcher(keywords)
+        return self._sensitive_matcher
 
     def as_dict(self) -> dict:
         """返回完整配置字典"""
-        result = dict(self.DEFAULTS)
-        result.update(self._config)
-        return result
+        return dict(self._merged)
 
     def update(self, config: dict):
         """更新配置"""
         self._config.update(config)
+        self._merged = {**self.DEFAULTS, **self._config}
+        self._sensitive_keywords = None
+        self._sensitive_matcher = None
@@ -0,0 +1,48 @@
+import os
+from collections.abc import Container, Iterator
+from pathlib import Path
+
+# 已压缩的日志后缀
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+# 导出/发送时打包的日志后缀
+LOG_SUFFIXES = (".log", *COMPRESSED_SUFFIXES)
+
+
+def walk_files(
+    root: Path | str, skip_dirs: Container[str] = ()
+) -> Iterator[os.DirEntry]:
+    """使用 os.scandir 递归遍历目录下的所有文件
+
+    DirEntry 自带文件类型和 stat 缓存，相比 Path.rglob + is_file/stat
+    可省去每个文件额外的系统调用和 Path 对象构造。
+    名称在 skip_dirs 中的子目录不会进入。
+    """
+    for entry, _ in walk_files_rel(root, "", skip_dirs):
+        yield entry
+
+
+def walk_files_rel(
+    root: Path | str, rel_root: str = "", skip_dirs: Container[str] = ()
+) -> Iterator[tuple[os.DirEntry, str]]:
+    """同 walk_files，额外返回以 "/" 分隔、以 rel_root 为前缀的相对路径
+
+    相对路径在下降时逐级拼接，打包时可直接作为 zip 包内路径，
+    无需对每个文件调用 Path.relative_to。
+    """
+    prefix = f"{rel_root}/" if rel_root else ""
+    stack = [(os.fspath(root), prefix)]
+    while stack:
+        dir_path, prefix = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in skip_dirs:
+                                stack.append((entry.path, f"{prefix}{entry.name}/"))
+                        elif entry.is_file():
+                            yield entry, prefix + entry.name
+                    except OSError:
+                        pass
+        except OSError:
+            pass
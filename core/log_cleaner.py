@@ -1,11 +1,13 @@
 import asyncio
-import gzip
 import os
-import shutil
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from ._statx import fast_stat
+from .compression import compress_file, resolve_algo
+from .fs_utils import COMPRESSED_SUFFIXES
+
 
 @dataclass
 class LogFileInfo:
@@ -13,8 +15,9 @@ class LogFileInfo:
 
     path: Path
     size: int
-    mtime: datetime
+    mtime: float  # st_mtime 时间戳
     is_compressed: bool
+    top_dir: str  # 所属的一级目录名，直接位于数据目录下的文件为 "root"
 
 
 class LogCleaner:
@@ -24,6 +27,8 @@ class LogCleaner:
         self.data_dir = data_dir
         self.config = config
         self._task: asyncio.Task = None
+        # 目录扫描缓存: 目录路径 -> (目录mtime_ns, 日志文件列表, 子目录列表)
+        self._dir_cache: dict[str, tuple[int, list[LogFileInfo], list[str]]] = {}
 
     async def start(self):
         """启动定时清理任务"""
@@ -74,7 +79,7 @@ class LogCleaner:
     async def _compress_old_logs(self, days: int) -> int:
         """压缩超过指定天数的日志"""
         count = 0
-        threshold = datetime.now() - timedelta(days=days)
+        threshold = (datetime.now() - timedelta(days=days)).timestamp()
 
         for log_file in self._scan_log_files():
             if log_file.is_compressed:
@@ -83,99 +88,188 @@ class LogCleaner:
                 if await self._compress_file(log_file.path):
                     count += 1
 
+        if count:
+            self._invalidate_cache()
         return count
 
     async def _compress_file(self, filepath: Path) -> bool:
         """异步压缩文件"""
         try:
-            gz_path = filepath.with_suffix(filepath.suffix + ".gz")
-            await asyncio.to_thread(self._do_compress, filepath, gz_path)
+            algo, suffix, level = resolve_algo(
+                self.config.get("compression_algo", "gzip"),
+                self.config.get("compression_level", 1),
+            )
+            dst = filepath.with_suffix(filepath.suffix + suffix)
+            # 不超过单文件大小上限的日志一次性读入压缩
+            one_shot_limit = self.config.get("max_file_size_mb", 10) * 1024 * 1024
+            await asyncio.to_thread(
+                compress_file, filepath, dst, algo, level, one_shot_limit
+            )
             return True
         except Exception:
             return False
 
-    def _do_compress(self, src: Path, dst: Path):
-        """同步压缩操作"""
-        with open(src, "rb") as f_in:
-            with gzip.open(dst, "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        os.remove(src)
-
     async def _clean_old_logs(
         self, max_age_days: int, max_total_size: int
     ) -> tuple[int, int]:
         """清理过期和超量日志"""
-        deleted = 0
-        freed = 0
-        threshold = datetime.now() - timedelta(days=max_age_days)
+        threshold = (datetime.now() - timedelta(days=max_age_days)).timestamp()
 
         # 获取所有日志文件并按时间排序
         files = sorted(self._scan_log_files(), key=lambda x: x.mtime)
-        total_size = sum(f.size for f in files)
+        if not files:
+            return 0, 0
 
-        for log_file in files:
-            should_delete = False
-
-            # 检查是否过期
-            if log_file.mtime < threshold:
-                should_delete = True
+        # 判断与删除放到线程中执行，避免阻塞事件循环
+        deleted, freed = await asyncio.to_thread(
+            self._remove_files, files, threshold, max_total_size
+        )
 
-            # 检查总大小是否超限
-            if total_size > max_total_size:
-                should_delete = True
+        if deleted:
+            self._invalidate_cache()
+        return deleted, freed
 
-            if should_delete:
-                try:
-                    size = log_file.size
-                    os.remove(log_file.path)
-                    deleted += 1
-                    freed += size
-                    total_size -= size
-                except Exception:
-                    pass
+    @staticmethod
+    def _remove_files(
+        files: list[LogFileInfo], threshold: float, max_total_size: int
+    ) -> tuple[int, int]:
+        """按时间顺序删除过期和超量的文件，返回(删除数量, 释放字节数)
 
+        只有删除成功才从总大小中扣除，删除失败时继续判断下一个文件，
+        直到当前文件未过期且总大小未超限，或已没有文件可删。
+        """
+        total_size = sum(f.size for f in files)
+        deleted = 0
+        freed = 0
+        for log_file in files:
+            # 文件按时间升序：当前文件未过期且总大小未超限时，之后的文件也都无需删除
+            if log_file.mtime >= threshold and total_size <= max_total_size:
+                break
+            try:
+                os.unlink(log_file.path)
+            except FileNotFoundError:
+                # 已被其他途径删除，同样不再占用空间
+                total_size -= log_file.size
+                continue
+            except OSError:
+                continue
+            deleted += 1
+            freed += log_file.size
+            total_size -= log_file.size
         return deleted, freed
 
     def _scan_log_files(self) -> list[LogFileInfo]:
-        """扫描所有日志文件"""
+        """扫描所有日志文件
+
+        按目录缓存扫描结果：目录 mtime 未变化说明其中没有文件增删，
+        直接复用缓存，只需重新 stat 仍在追加写入的 .log 文件。
+        """
         files = []
-        for path in self.data_dir.rglob("*"):
-            if path.is_file() and (path.suffix == ".log" or ".log." in path.name):
+        dir_cache = {}
+        root = str(self.data_dir)
+        stack = [(root, "root")]
+        while stack:
+            dir_path, top_dir = stack.pop()
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = self._dir_cache.get(dir_path)
+            if cached and cached[0] == mtime_ns:
+                dir_files = self._refresh_active_files(cached[1])
+                subdirs = cached[2]
+            else:
+                dir_files, subdirs = self._scan_dir(dir_path, top_dir)
+
+            dir_cache[dir_path] = (mtime_ns, dir_files, subdirs)
+            files.extend(dir_files)
+            if dir_path == root:
+                stack.extend((d, os.path.basename(d)) for d in subdirs)
+            else:
+                stack.extend((d, top_dir) for d in subdirs)
+
+        self._dir_cache = dir_cache
+        return files
+
+    def _scan_dir(
+        self, dir_path: str, top_dir: str
+    ) -> tuple[list[LogFileInfo], list[str]]:
+        """扫描单个目录，返回(日志文件列表, 子目录列表)"""
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        name = entry.name
+                        if entry.is_file() and (
+                            name.endswith(".log") or ".log." in name
+                        ):
+                            size, mtime = fast_stat(os.fsencode(entry.path))
+                            files.append(
+                                LogFileInfo(
+                                    path=Path(entry.path),
+                                    size=size,
+                                    mtime=mtime,
+                                    is_compressed=name.endswith(COMPRESSED_SUFFIXES),
+                                    top_dir=top_dir,
+                                )
+                            )
+                    except Exception:
+                        pass
+        except OSError:
+            pass
+        return files, subdirs
+
+    @staticmethod
+    def _refresh_active_files(files: list[LogFileInfo]) -> list[LogFileInfo]:
+        """刷新缓存中仍在写入的 .log 文件，轮换备份和压缩文件不会再变化"""
+        for info in files:
+            if info.path.suffix == ".log":
                 try:
-                    stat = path.stat()
-                    files.append(
-                        LogFileInfo(
-                            path=path,
-                            size=stat.st_size,
-                            mtime=datetime.fromtimestamp(stat.st_mtime),
-                            is_compressed=path.suffix == ".gz",
-                        )
-                    )
+                    size, mtime = fast_stat(os.fsencode(info.path))
+                    info.size = size
+                    info.mtime = mtime
                 except Exception:
                     pass
         return files
 
+    def _invalidate_cache(self):
+        """清空目录扫描缓存"""
+        self._dir_cache.clear()
+
     def get_stats(self) -> dict:
         """获取日志统计信息"""
         files = self._scan_log_files()
-        total_size = sum(f.size for f in files)
-        compressed_count = sum(1 for f in files if f.is_compressed)
 
-        # 按目录统计
+        # 单次遍历汇总全部统计
+        total_size = 0
+        compressed_count = 0
+        oldest = float("inf")
+        newest = float("-inf")
         dir_stats = {}
         for f in files:
-            rel_path = f.path.relative_to(self.data_dir)
-            top_dir = rel_path.parts[0] if rel_path.parts else "root"
-            if top_dir not in dir_stats:
-                dir_stats[top_dir] = {"count": 0, "size": 0}
-            dir_stats[top_dir]["count"] += 1
-            dir_stats[top_dir]["size"] += f.size
+            total_size += f.size
+            compressed_count += f.is_compressed
+            if f.mtime < oldest:
+                oldest = f.mtime
+            if f.mtime > newest:
+                newest = f.mtime
+            d = dir_stats.get(f.top_dir)
+            if d is None:
+                dir_stats[f.top_dir] = d = {"count": 0, "size": 0}
+            d["count"] += 1
+            d["size"] += f.size
 
         return {
             "total_files": len(files),
-            "total_size_mb": round(total_size / 1024 / 1024, 2),
+            "total_size_mb": total_size / (1024 * 1024),
             "compressed_count": compressed_count,
             "directories": dir_stats,
-            "oldest_file": min((f.mtime for f in files), default=None),
-            "newest_file": max((f.mtime for f in files), default=None),
+            "oldest_file": datetime.fromtimestamp(oldest) if files else None,
+            "newest_file": datetime.fromtimestamp(newest) if files else None,
         }
@@ -1,18 +1,108 @@
-import gzip
 import logging
 import os
-import shutil
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import (
+    QueueHandler,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 from pathlib import Path
-
+from types import MappingProxyType
+
+from .compression import compress_file, resolve_algo
+from .fs_utils import COMPRESSED_SUFFIXES
+from .log_router import LogRouter
+
+__all__ = [
+    "CompressedRotatingFileHandler",
+    "CompressedTimedRotatingFileHandler",
+    "CachedFormatter",
+    "FastFormatter",
+    "LogPlusHandler",
+    "LogPlusQueueHandler",
+]
+
+# zlib 压缩时释放 GIL，多个文件同时轮换时可并行压缩
 _compress_executor = ThreadPoolExecutor(
-    max_workers=1, thread_name_prefix="logplus_compress"
+    max_workers=min(4, os.cpu_count() or 2), thread_name_prefix="logplus_compress"
 )
+# 限制排队中的压缩任务数，超出时由提交方线程直接压缩以形成背压
+_compress_slots = threading.BoundedSemaphore(8)
+# 已提交但尚未完成的文件，避免同一文件被重复压缩
+_compress_lock = threading.Lock()
+_compress_pending: set[str] = set()
+
+# 后台刷新缓冲区的间隔（秒）
+_FLUSH_INTERVAL = 1.0
+# LogPlusHandler 存放已格式化文本的记录属性名
+_CACHED_MSG_ATTR = "_logplus_msg"
+# 标记记录是 LogPlusQueueHandler 入队的副本，只有后台线程持有
+_OWNED_ATTR = "_logplus_owned"
+# 入队时无需快照的参数类型，调用方之后无法修改其内容
+_IMMUTABLE_ARG_TYPES = frozenset({str, int, float, bool, bytes, type(None)})
+# 日志文件的写缓冲区大小，缓冲区写满或定时 flush 时才真正写入磁盘
+_WRITE_BUFSIZE = 64 * 1024
+
+
+class _DeferredFlushMixin:
+    """写入记录后不立即 flush，由 LogPlusHandler 的后台线程定期刷新
+
+    与 StreamHandler.emit 相同，只是去掉了写入后的 flush，
+    日志先进入 64KB 的文件缓冲区，攒满后一次 write。
+    同时记录已写入的字节数，轮换判断无需调用会强制刷新缓冲区的 stream.tell()，
+    每条记录也只格式化一次。
+    """
+
+    _stream_size = 0
+    # 自上次 flush 后是否写入过数据，空闲的文件在定时刷新时直接跳过
+    _dirty = False
+
+    def _open(self):
+        stream = self._builtin_open(
+            self.baseFilename,
+            self.mode,
+            buffering=_WRITE_BUFSIZE,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+        self._stream_size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def _encoded_size(self, msg: str) -> int:
+        """msg 写入文件后的字节数，maxBytes 按字节计，中文等非 ASCII 文本需按编码计算"""
+        if msg.isascii():
+            return len(msg)
+        return len(msg.encode(self.encoding or "utf-8", self.errors or "strict"))
 
+    def _should_rollover(self, record, size: int) -> bool:
+        """判断写入 size 字节前是否需要轮换"""
+        return self.shouldRollover(record)
 
-class CompressedRotatingFileHandler(RotatingFileHandler):
+    def flush(self):
+        if self._dirty:
+            self._dirty = False
+            super().flush()
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            size = self._encoded_size(msg)
+            if self._should_rollover(record, size):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._stream_size += size
+            self._dirty = True
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class CompressedRotatingFileHandler(_DeferredFlushMixin, RotatingFileHandler):
     """支持压缩的大小轮换Handler"""
 
     def __init__(
@@ -24,33 +114,52 @@ class CompressedRotatingFileHandler(RotatingFileHandler):
         encoding=None,
         delay=False,
         enable_compression=True,
+        compression_algo="gzip",
+        compression_level=9,
     ):
         self.enable_compression = enable_compression
+        self.compression_algo = compression_algo
+        self.compression_level = compression_level
         super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
 
+    def _should_rollover(self, record, size: int) -> bool:
+        # 与 RotatingFileHandler.shouldRollover 相同，但使用记录的写入字节数代替 tell()
+        if self.maxBytes <= 0:
+            return False
+        return 0 < self._stream_size and self._stream_size + size >= self.maxBytes
+
     def doRollover(self):
         if self.stream:
             self.stream.close()
             self.stream = None
 
         if self.backupCount > 0:
+            # 读取一次目录代替对每个备份文件调用 os.path.exists
+            try:
+                with os.scandir(os.path.dirname(self.baseFilename)) as it:
+                    existing = {entry.name for entry in it}
+            except OSError:
+                existing = set()
+
             # 异步压缩最旧的文件
             if self.enable_compression:
                 oldest = f"{self.baseFilename}.{self.backupCount}"
-                if os.path.exists(oldest):
-                    _compress_executor.submit(_compress_file_sync, oldest)
+                if os.path.basename(oldest) in existing:
+                    _submit_compress(
+                        oldest, self.compression_algo, self.compression_level
+                    )
 
-            # 轮换文件
+            # 轮换文件，os.replace 会直接覆盖已存在的目标
             for i in range(self.backupCount - 1, 0, -1):
                 sfn = self.rotation_filename(f"{self.baseFilename}.{i}")
                 dfn = self.rotation_filename(f"{self.baseFilename}.{i + 1}")
-                if os.path.exists(sfn):
-                    if os.path.exists(dfn):
-                        os.remove(dfn)
-                    os.rename(sfn, dfn)
+                if os.path.basename(sfn) in existing:
+                    os.replace(sfn, dfn)
 
+            # 交给 rotate 处理，保留 rotator/namer 扩展点；
+            # backupCount 为 1 时上面的循环不会移走旧的 .1，需先删除
             dfn = self.rotation_filename(f"{self.baseFilename}.1")
-            if os.path.exists(dfn):
+            if self.backupCount == 1 and os.path.basename(dfn) in existing:
                 os.remove(dfn)
             self.rotate(self.baseFilename, dfn)
 
@@ -58,19 +167,44 @@ class CompressedRotatingFileHandler(RotatingFileHandler):
             self.stream = self._open()
 
 
-def _compress_file_sync(filepath: str):
+def _compress_file_sync(filepath: str, algo: str = "gzip", level: int = 9):
     """在线程池中同步压缩文件"""
-    gz_path = f"{filepath}.gz"
     try:
-        with open(filepath, "rb") as f_in:
-            with gzip.open(gz_path, "wb") as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        os.remove(filepath)
+        algo, suffix, level = resolve_algo(algo, level)
+        compress_file(filepath, f"{filepath}{suffix}", algo, level)
     except Exception:
         pass
 
 
-class CompressedTimedRotatingFileHandler(TimedRotatingFileHandler):
+def _submit_compress(filepath: str, algo: str, level: int):
+    """提交单个文件的压缩任务，排队任务已满时在当前线程压缩"""
+    with _compress_lock:
+        if filepath in _compress_pending:
+            return
+        _compress_pending.add(filepath)
+
+    if _compress_slots.acquire(blocking=False):
+        try:
+            _compress_executor.submit(_run_compress, filepath, algo, level, True)
+            return
+        except RuntimeError:
+            # 解释器退出时线程池不再接受任务
+            _compress_slots.release()
+    _run_compress(filepath, algo, level, False)
+
+
+def _run_compress(filepath: str, algo: str, level: int, holds_slot: bool):
+    """执行压缩并释放占用的排队名额"""
+    try:
+        _compress_file_sync(filepath, algo, level)
+    finally:
+        with _compress_lock:
+            _compress_pending.discard(filepath)
+        if holds_slot:
+            _compress_slots.release()
+
+
+class CompressedTimedRotatingFileHandler(_DeferredFlushMixin, TimedRotatingFileHandler):
     """支持压缩的时间轮换Handler"""
 
     def __init__(
@@ -84,8 +218,12 @@ class CompressedTimedRotatingFileHandler(TimedRotatingFileHandler):
         utc=False,
         atTime=None,
         enable_compression=True,
+        compression_algo="gzip",
+        compression_level=9,
     ):
         self.enable_compression = enable_compression
+        self.compression_algo = compression_algo
+        self.compression_level = compression_level
         super().__init__(
             filename, when, interval, backupCount, encoding, delay, utc, atTime
         )
@@ -98,28 +236,99 @@ class CompressedTimedRotatingFileHandler(TimedRotatingFileHandler):
                 os.path.dirname(self.baseFilename),
                 os.path.basename(self.baseFilename),
                 self.baseFilename,
+                self.compression_algo,
+                self.compression_level,
             )
 
 
-def _compress_old_files_sync(dir_path: str, base_name: str, current_file: str):
+def _compress_old_files_sync(
+    dir_path: str, base_name: str, current_file: str, algo: str, level: int
+):
     """在线程池中同步压缩旧日志文件"""
-    now = datetime.now()
+    # 修改时间早于一天前的文件才压缩，直接比较时间戳
+    threshold = time.time() - 86400
     try:
-        for filename in os.listdir(dir_path):
-            if filename.startswith(base_name) and not filename.endswith(".gz"):
-                filepath = os.path.join(dir_path, filename)
-                if filepath == current_file:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                name = entry.name
+                if not name.startswith(base_name) or name.endswith(COMPRESSED_SUFFIXES):
+                    continue
+                if entry.path == current_file:
                     continue
                 try:
-                    mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-                    if (now - mtime).days >= 1:
-                        _compress_file_sync(filepath)
+                    if entry.stat().st_mtime <= threshold:
+                        _submit_compress(entry.path, algo, level)
                 except Exception:
                     pass
     except Exception:
         pass
 
 
+class FastFormatter(logging.Formatter):
+    """按秒缓存时间字符串的 Formatter
+
+    datefmt 精确到秒，同一秒内的记录复用上次 localtime + strftime 的结果。
+    缓存以 (秒, 字符串) 元组整体替换，多线程下无需加锁。
+    """
+
+    def __init__(self, fmt=None, datefmt=None):
+        super().__init__(fmt, datefmt)
+        self._time_cache: tuple[int, str] = (-1, "")
+
+    def formatTime(self, record, datefmt=None):
+        if not datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, cached = self._time_cache
+        if second != cached_second:
+            cached = time.strftime(datefmt, self.converter(second))
+            self._time_cache = (second, cached)
+        return cached
+
+
+class CachedFormatter(FastFormatter):
+    """优先返回 LogPlusHandler 预先格式化好的文本
+
+    同一条记录会写入 all/core/plugin/error 多个文件，格式相同，
+    由 LogPlusHandler 格式化一次后挂在记录上，各子Handler直接复用。
+    """
+
+    def format(self, record):
+        msg = record.__dict__.get(_CACHED_MSG_ATTR)
+        if msg is not None:
+            return msg
+        return super().format(record)
+
+
+class LogPlusQueueHandler(QueueHandler):
+    """把日志记录放入队列，由 QueueListener 在后台线程交给 LogPlusHandler 处理
+
+    调用方线程只做一次入队，脱敏、路由与文件写入都在后台线程完成。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 始终入队浅拷贝：后台线程格式化时会写入 message、asctime、exc_text 等属性，
+        # 不能与调用方线程上其他 Handler 共用同一个记录对象
+        snapshot = record.__class__.__new__(record.__class__)
+        snapshot.__dict__ = record.__dict__.copy()
+        snapshot.__dict__[_OWNED_ATTR] = True
+
+        # msg 与参数都是不可变值时，稍后在后台线程格式化结果不变；
+        # 否则与基类一样在调用方线程按当时的值生成消息，避免入队后对象被修改，
+        # exc_info 保留给后台线程格式化
+        args = record.args
+        if type(record.msg) is not str or (
+            args
+            and not (
+                isinstance(args, tuple)
+                and all(type(arg) in _IMMUTABLE_ARG_TYPES for arg in args)
+            )
+        ):
+            snapshot.msg = record.getMessage()
+            snapshot.args = None
+        return snapshot
+
+
 class LogPlusHandler(logging.Handler):
     """日志增强主Handler，负责分发日志到各个文件"""
 
@@ -129,9 +338,23 @@ class LogPlusHandler(logging.Handler):
         self.config = config
         self.sensitive_filter = sensitive_filter
         self.handlers: dict[str, logging.Handler] = {}
+        # 插件名 -> Handler，emit 中直接按插件名查找
+        self._plugin_handlers: dict[str, logging.Handler] = {}
+        # 所有子Handler共用一个 Formatter，时间缓存对各文件同时生效
+        self._formatter = CachedFormatter(
+            fmt="[%(asctime)s] [%(levelname)-5s] [%(filename)s:%(lineno)d]: %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
         self._init_directories()
         self._init_handlers()
 
+        # 定期刷新各文件缓冲区；进程退出时 logging.shutdown 会再 flush 并关闭
+        self._flush_stop = threading.Event()
+        self._flush_thread = threading.Thread(
+            target=self._flush_loop, name="logplus_flush", daemon=True
+        )
+        self._flush_thread.start()
+
     def _init_directories(self):
         """初始化日志目录"""
         dirs = ["all", "core", "errors", "plugins"]
@@ -140,47 +363,51 @@ class LogPlusHandler(logging.Handler):
 
     def _init_handlers(self):
         """初始化各类日志Handler"""
-        max_bytes = self.config.get("max_file_size_mb", 10) * 1024 * 1024
-        backup_count = self.config.get("backup_count", 5)
-        strategy = self.config.get("rotation_strategy", "size")
-        interval = self.config.get("rotation_interval", "daily")
-        enable_compression = self.config.get("enable_compression", True)
+        # 配置在运行期间不变，读取一次供插件Handler创建和 emit 使用
+        self._handler_kwargs = MappingProxyType(
+            {
+                "max_bytes": self.config.get("max_file_size_mb", 10) * 1024 * 1024,
+                "backup_count": self.config.get("backup_count", 5),
+                "strategy": self.config.get("rotation_strategy", "size"),
+                "interval": self.config.get("rotation_interval", "daily"),
+                "enable_compression": self.config.get("enable_compression", True),
+                "compression_algo": self.config.get("compression_algo", "gzip"),
+                "compression_level": self.config.get("compression_level", 1),
+            }
+        )
+        self._plugin_separation = self.config.get("enable_plugin_separation", True)
 
         # 全局日志
         if self.config.get("enable_all_log", True):
             self.handlers["all"] = self._create_handler(
-                self.data_dir / "all" / "all.log",
-                max_bytes,
-                backup_count,
-                strategy,
-                interval,
-                enable_compression,
+                self.data_dir / "all" / "all.log", **self._handler_kwargs
             )
 
         # Core日志
         if self.config.get("enable_core_log", True):
             self.handlers["core"] = self._create_handler(
-                self.data_dir / "core" / "core.log",
-                max_bytes,
-                backup_count,
-                strategy,
-                interval,
-                enable_compression,
+                self.data_dir / "core" / "core.log", **self._handler_kwargs
             )
 
         # 错误日志
         if self.config.get("enable_error_log", True):
             handler = self._create_handler(
-                self.data_dir / "errors" / "error.log",
-                max_bytes,
-                backup_count,
-                strategy,
-                interval,
-                enable_compression,
+                self.data_dir / "errors" / "error.log", **self._handler_kwargs
             )
             handler.setLevel(logging.ERROR)
             self.handlers["error"] = handler
 
+        # emit 中直接引用固定的子Handler，省去字典查找
+        self._all_handler = self.handlers.get("all")
+        self._core_handler = self.handlers.get("core")
+        self._error_handler = self.handlers.get("error")
+
+        # 低于所有子Handler级别的记录无需脱敏和路由；插件Handler按需创建，级别为 NOTSET
+        levels = [h.level for h in self.handlers.values()]
+        if self._plugin_separation:
+            levels.append(logging.NOTSET)
+        self._min_level = min(levels, default=logging.CRITICAL + 1)
+
     def _create_handler(
         self,
         filepath: Path,
@@ -189,6 +416,8 @@ class LogPlusHandler(logging.Handler):
         strategy: str,
         interval: str,
         enable_compression: bool,
+        compression_algo: str,
+        compression_level: int,
     ) -> logging.Handler:
         """根据策略创建对应的Handler"""
         filepath.parent.mkdir(parents=True, exist_ok=True)
@@ -201,6 +430,8 @@ class LogPlusHandler(logging.Handler):
                 backupCount=backup_count,
                 encoding="utf-8",
                 enable_compression=enable_compression,
+                compression_algo=compression_algo,
+                compression_level=compression_level,
             )
         else:  # size 或 hybrid
             handler = CompressedRotatingFileHandler(
@@ -209,69 +440,86 @@ class LogPlusHandler(logging.Handler):
                 backupCount=backup_count,
                 encoding="utf-8",
                 enable_compression=enable_compression,
+                compression_algo=compression_algo,
+                compression_level=compression_level,
             )
 
-        formatter = logging.Formatter(
-            fmt="[%(asctime)s] [%(levelname)-5s] [%(filename)s:%(lineno)d]: %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-        handler.setFormatter(formatter)
+        handler.setFormatter(self._formatter)
         return handler
 
     def get_plugin_handler(self, plugin_name: str) -> logging.Handler:
         """获取或创建插件专属Handler"""
-        key = f"plugin_{plugin_name}"
-        if key not in self.handlers:
-            plugin_dir = self.data_dir / "plugins" / plugin_name
-            max_bytes = self.config.get("max_file_size_mb", 10) * 1024 * 1024
-            backup_count = self.config.get("backup_count", 5)
-            strategy = self.config.get("rotation_strategy", "size")
-            interval = self.config.get("rotation_interval", "daily")
-            enable_compression = self.config.get("enable_compression", True)
-
-            self.handlers[key] = self._create_handler(
-                plugin_dir / "plugin.log",
-                max_bytes,
-                backup_count,
-                strategy,
-                interval,
-                enable_compression,
+        handler = self._plugin_handlers.get(plugin_name)
+        if handler is None:
+            handler = self._create_handler(
+                self.data_dir / "plugins" / plugin_name / "plugin.log",
+                **self._handler_kwargs,
             )
-        return self.handlers[key]
+            self._plugin_handlers[plugin_name] = handler
+            self.handlers[f"plugin_{plugin_name}"] = handler
+        return handler
 
     def emit(self, record: logging.LogRecord):
         """处理日志记录"""
+        if record.levelno < self._min_level:
+            return
+
         try:
             # 复制 record 并进行脱敏，避免影响其他 Handler
+            original = record
             if self.sensitive_filter:
                 record = self.sensitive_filter.mask_record(record)
 
-            # 写入全局日志
-            if "all" in self.handlers:
-                self.handlers["all"].emit(record)
+            # 缓存的文本只能挂在自己持有的副本上，不能写进调用方仍在使用的原记录
+            if record is original and not record.__dict__.get(_OWNED_ATTR):
+                copied = record.__class__.__new__(record.__class__)
+                copied.__dict__ = record.__dict__.copy()
+                record = copied
 
-            # 判断来源并写入对应日志
-            is_plugin = self._is_plugin_path(record.pathname)
+            # 只格式化一次，各子Handler的 CachedFormatter 直接复用
+            record.__dict__[_CACHED_MSG_ATTR] = self._formatter.format(record)
+            try:
+                self._dispatch(record)
+            finally:
+                record.__dict__.pop(_CACHED_MSG_ATTR, None)
 
-            if is_plugin:
-                plugin_name = self._extract_plugin_name(record.pathname)
-                if plugin_name and self.config.get("enable_plugin_separation", True):
-                    handler = self.get_plugin_handler(plugin_name)
-                    handler.emit(record)
-            else:
-                # Core日志
-                if "core" in self.handlers:
-                    self.handlers["core"].emit(record)
+        except Exception:
+            self.handleError(record)
 
-            # 错误日志
-            if "error" in self.handlers and record.levelno >= logging.ERROR:
-                self.handlers["error"].emit(record)
+    def _dispatch(self, record: logging.LogRecord):
+        """将记录写入对应的子Handler"""
+        # 写入全局日志
+        if self._all_handler:
+            self._all_handler.emit(record)
 
-            # 确保及时写入磁盘
-            self._flush_handlers()
+        # 判断来源并写入对应日志
+        source_type, plugin_name = LogRouter.classify(record.pathname)
 
-        except Exception:
-            self.handleError(record)
+        if source_type == "plugin":
+            if plugin_name and self._plugin_separation:
+                handler = self.get_plugin_handler(plugin_name)
+                handler.emit(record)
+        else:
+            # Core日志
+            if self._core_handler:
+                self._core_handler.emit(record)
+
+        # 错误日志
+        if self._error_handler and record.levelno >= logging.ERROR:
+            self._error_handler.emit(record)
+
+    def _flush_loop(self):
+        """后台线程：每隔 _FLUSH_INTERVAL 秒刷新一次缓冲区"""
+        while not self._flush_stop.wait(_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        """刷新所有子Handler，与 emit 共用锁以免和写入、轮换并发"""
+        self.acquire()
+        try:
+            self._flush_handlers()
+        finally:
+            self.release()
 
     def _flush_handlers(self):
         """刷新所有handler缓冲区以确保及时写入"""
@@ -281,40 +529,13 @@ class LogPlusHandler(logging.Handler):
             except Exception:
                 pass
 
-    def _is_plugin_path(self, pathname: str) -> bool:
-        """判断是否来自插件目录"""
-        norm_path = os.path.normpath(pathname)
-        return "data/plugins" in norm_path or "astrbot/builtin_stars/" in norm_path
-
-    def _extract_plugin_name(self, pathname: str) -> str | None:
-        """从路径提取插件名"""
-        norm_path = os.path.normpath(pathname)
-
-        # data/plugins/plugin_name/...
-        if "data/plugins" in norm_path:
-            parts = norm_path.split(os.sep)
-            try:
-                idx = parts.index("plugins")
-                if idx + 1 < len(parts):
-                    return parts[idx + 1]
-            except ValueError:
-                pass
-
-        # astrbot/builtin_stars/plugin_name/...
-        if "builtin_stars" in norm_path:
-            parts = norm_path.split(os.sep)
-            try:
-                idx = parts.index("builtin_stars")
-                if idx + 1 < len(parts):
-                    return parts[idx + 1]
-            except ValueError:
-                pass
-
-        return None
-
     def close(self):
         """关闭所有Handler"""
+        self._flush_stop.set()
+        self._flush_thread.join(timeout=_FLUSH_INTERVAL * 2)
         for handler in self.handlers.values():
             handler.close()
         self.handlers.clear()
+        self._plugin_handlers.clear()
+        self._all_handler = self._core_handler = self._error_handler = None
         super().close()
@@ -1,55 +1,55 @@
+import functools
 import os
 from pathlib import Path
 
+__all__ = ["LogRouter"]
+
 
 class LogRouter:
-    """日志路由器，负责日志来源判断和路径解析"""
+    """日志路由器，负责日志来源判断和路径解析
+
+    日志记录的 pathname 来自模块 __file__，进程内不同取值有限，
+    判断结果按 pathname 缓存，每条日志的路由只需一次字典查找。
+    """
 
     PLUGIN_PATHS = ["data/plugins", "astrbot/builtin_stars/"]
 
+    # 插件目录的(父目录, 目录)名，按路径组件匹配，与平台分隔符无关
+    _PLUGIN_PARENTS = frozenset(tuple(p.strip("/").split("/")) for p in PLUGIN_PATHS)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=2048)
+    def classify(pathname: str) -> tuple[str, str | None]:
+        """解析路径，返回(来源类型 plugin 或 core, 插件名)
+
+        只做一次 normpath 和 split，单次遍历路径组件：
+        data/plugins/<插件名>/... 或 astrbot/builtin_stars/<插件名>/...
+        """
+        parts = os.path.normpath(pathname).split(os.sep)
+        for i in range(len(parts) - 2):
+            if (parts[i], parts[i + 1]) in LogRouter._PLUGIN_PARENTS:
+                return "plugin", parts[i + 2]
+        return "core", None
+
     @staticmethod
     def is_plugin_path(pathname: str) -> bool:
         """判断路径是否来自插件"""
-        norm_path = os.path.normpath(pathname)
-        return any(p in norm_path for p in LogRouter.PLUGIN_PATHS)
+        return LogRouter.classify(pathname)[0] == "plugin"
 
     @staticmethod
     def extract_plugin_name(pathname: str) -> str | None:
         """从路径提取插件名"""
-        norm_path = os.path.normpath(pathname)
-        parts = norm_path.split(os.sep)
-
-        # data/plugins/plugin_name/...
-        if "plugins" in parts:
-            try:
-                idx = parts.index("plugins")
-                if idx + 1 < len(parts):
-                    return parts[idx + 1]
-            except ValueError:
-                pass
-
-        # astrbot/builtin_stars/plugin_name/...
-        if "builtin_stars" in parts:
-            try:
-                idx = parts.index("builtin_stars")
-                if idx + 1 < len(parts):
-                    return parts[idx + 1]
-            except ValueError:
-                pass
-
-        return None
+        return LogRouter.classify(pathname)[1]
 
     @staticmethod
     def get_source_type(pathname: str) -> str:
         """获取日志来源类型: plugin 或 core"""
-        return "plugin" if LogRouter.is_plugin_path(pathname) else "core"
+        return LogRouter.classify(pathname)[0]
 
     @staticmethod
     def get_log_dir(data_dir: Path, pathname: str) -> Path:
         """根据日志来源获取日志目录"""
-        if LogRouter.is_plugin_path(pathname):
-            plugin_name = LogRouter.extract_plugin_name(pathname)
-            if plugin_name:
-                return data_dir / "plugins" / plugin_name
-            return data_dir / "plugins" / "unknown"
+        source_type, plugin_name = LogRouter.classify(pathname)
+        if source_type == "plugin":
+            return data_dir / "plugins" / (plugin_name or "unknown")
         return data_dir / "core"
@@ -1,7 +1,8 @@
-import copy
 import logging
 import re
 
+__all__ = ["SensitiveFilter"]
+
 
 class SensitiveFilter:
     """敏感信息脱敏处理器
@@ -32,57 +33,100 @@ class SensitiveFilter:
 
     MASK = "***"
 
-    def __init__(self, keywords: list[str] = None, enabled: bool = True):
+    def __init__(
+        self,
+        keywords: list[str] = None,
+        enabled: bool = True,
+        matcher: re.Pattern = None,
+    ):
         self.enabled = enabled
         self.keywords = keywords or self.DEFAULT_KEYWORDS
-        self._compile_patterns()
+        self._compile_patterns(matcher)
+
+    @staticmethod
+    def compile_matcher(keywords: list[str]) -> re.Pattern:
+        """编译匹配任一敏感词的正则，用于单次扫描判断文本是否需要脱敏"""
+        return re.compile(
+            "|".join(re.escape(k) for k in keywords if k) or "(?!)", re.IGNORECASE
+        )
 
-    def _compile_patterns(self):
+    def _compile_patterns(self, matcher: re.Pattern = None):
         """编译正则表达式模式"""
-        self.patterns = []
-
-        for keyword in self.keywords:
-            # 匹配 key=value 或 key: value 或 "key": "value"
-            patterns = [
-                # key=value
-                rf'({keyword})\s*=\s*["\']?([^"\'\s,}}\]]+)["\']?',
-                # key: value
-                rf'({keyword})\s*:\s*["\']?([^"\'\s,}}\]]+)["\']?',
-                # "key": "value"
-                rf'["\']({keyword})["\']\s*:\s*["\']([^"\']+)["\']',
-            ]
-            for p in patterns:
-                self.patterns.append(re.compile(p, re.IGNORECASE))
+        self._matcher = matcher or self.compile_matcher(self.keywords)
+        # 未参与匹配的分组在替换模板中为空串，\1 与 \3 只有一个有值
+        self._repl = rf"\1\3={self.MASK}"
+
+        # 所有敏感词合并为一个分支，长词在前，同一位置优先匹配更完整的关键词
+        keywords = sorted((k for k in self.keywords if k), key=len, reverse=True)
+        kw = "|".join(re.escape(k) for k in keywords) or "(?!)"
+
+        # 值遇到下一个 "敏感词=" 或 "敏感词:" 时截止，让后面的敏感值也能被替换，
+        # 如 auth=user_password: hunter2 不会只替换到 password: 为止
+        value = rf'(?:(?!(?:{kw})\s*[=:])[^"\'\s,}}\]])+'
+
+        # 三种形式合并为一个正则，一次扫描完成全部替换:
+        # "key": "value" 或 key=value 或 key: value
+        self._pattern = re.compile(
+            rf'["\']({kw})["\']\s*:\s*["\']([^"\']+)["\']'
+            rf'|({kw})\s*[=:]\s*["\']?({value})["\']?',
+            re.IGNORECASE,
+        )
 
     def mask_record(self, record: logging.LogRecord) -> logging.LogRecord:
         """对 LogRecord 进行脱敏处理，返回副本以避免影响其他 Handler"""
         if not self.enabled:
             return record
 
-        masked_record = copy.copy(record)
+        # 绝大多数日志不含敏感词，无需复制直接返回原记录
+        if not self._contains_keyword(record):
+            return record
+
+        # 直接复制实例字典，比 copy.copy 走通用 __reduce_ex__ 协议快
+        masked_record = record.__class__.__new__(record.__class__)
+        masked_record.__dict__ = record.__dict__.copy()
 
-        if hasattr(masked_record, "msg") and masked_record.msg:
-            masked_record.msg = self._mask_sensitive(str(masked_record.msg))
+        if masked_record.msg:
+            masked_record.msg = self._mask_value(masked_record.msg)
 
-        if hasattr(masked_record, "args") and masked_record.args:
+        if masked_record.args:
             if isinstance(masked_record.args, dict):
                 masked_record.args = {
-                    k: self._mask_sensitive(str(v))
-                    for k, v in masked_record.args.items()
+                    k: self._mask_value(v) for k, v in masked_record.args.items()
                 }
             elif isinstance(masked_record.args, tuple):
                 masked_record.args = tuple(
-                    self._mask_sensitive(str(arg)) for arg in masked_record.args
+                    self._mask_value(arg) for arg in masked_record.args
                 )
 
         return masked_record
 
+    def _mask_value(self, value):
+        """脱敏单个值，未命中时原样返回，保留非字符串参数的类型（如 %d 所需的数字）"""
+        text = value if isinstance(value, str) else str(value)
+        masked = self._mask_sensitive(text)
+        return value if masked is text else masked
+
+    def _contains_keyword(self, record: logging.LogRecord) -> bool:
+        """判断 msg 或 args 中是否出现任一敏感词"""
+        search = self._matcher.search
+        if record.msg and search(str(record.msg)):
+            return True
+
+        args = record.args
+        if isinstance(args, dict):
+            args = args.values()
+        elif not isinstance(args, tuple):
+            return False
+        return any(search(str(arg)) for arg in args)
+
     def _mask_sensitive(self, text: str) -> str:
         """脱敏敏感信息"""
-        result = text
-        for pattern in self.patterns:
-            result = pattern.sub(rf"\1={self.MASK}", result)
-        return result
+        # 不含任何敏感词时跳过逐个模式替换
+        if not self._matcher.search(text):
+            return text
+        result, replaced = self._pattern.subn(self._repl, text)
+        # 没有实际替换时返回原对象，调用方据此判断无需更新
+        return result if replaced else text
 
     def update_keywords(self, keywords: list[str]):
         """更新敏感词列表"""
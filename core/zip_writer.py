@@ -0,0 +1,162 @@
+import os
+import sys
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .fs_utils import COMPRESSED_SUFFIXES
+
+# 超过该大小的文件不在内存中预压缩，直接由 ZipFile 流式写入
+_PRECOMPRESS_MAX_SIZE = 64 * 1024 * 1024
+# 同时驻留内存的预压缩文件总大小上限（按原始大小计）
+_PENDING_MAX_BYTES = 256 * 1024 * 1024
+# zlib 支持的压缩级别范围，-1 为默认级别
+_LEVEL_RANGE = (-1, 9)
+
+# _write_precompressed 依赖的 ZipFile 内部属性，仅在验证过的版本上使用
+_ZIPFILE_INTERNALS = (
+    "_writing",
+    "_lock",
+    "_seekable",
+    "fp",
+    "start_dir",
+    "_writecheck",
+    "_didModify",
+    "filelist",
+    "NameToInfo",
+)
+_PRECOMPRESS_VERSIONS = ((3, 10), (3, 13))
+
+
+def _deflate_file(path: str, level: int) -> tuple[bytes, int, int]:
+    """读取整个文件并以 raw deflate 压缩，返回(压缩数据, CRC32, 原始大小)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    compressed = compressor.compress(data) + compressor.flush()
+    return compressed, zlib.crc32(data), len(data)
+
+
+def _write_precompressed(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: bytes):
+    """将已压缩好的 deflate 数据作为条目写入 zip，流程与 ZipFile._open_to_write 一致"""
+    if zf._writing:
+        raise ValueError(
+            "Can't write to ZIP archive while an open writing handle exists"
+        )
+
+    with zf._lock:
+        zinfo.flag_bits = 0x00
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+
+        zf._writecheck(zinfo)
+        zf._didModify = True
+
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(data)
+        zf.start_dir = zf.fp.tell()
+
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def _supports_precompressed(zf: zipfile.ZipFile) -> bool:
+    """当前 Python 的 ZipFile 内部实现是否与 _write_precompressed 一致"""
+    low, high = _PRECOMPRESS_VERSIONS
+    if not low <= sys.version_info[:2] <= high:
+        return False
+    return all(hasattr(zf, name) for name in _ZIPFILE_INTERNALS)
+
+
+def write_zip(zip_path, files: list[tuple[str, str]], compresslevel: int = 1) -> int:
+    """打包日志文件，返回成功写入的文件数
+
+    files 为 [(文件路径, 包内路径)]，条目按 files 的顺序写入。已压缩的 .gz/.zst
+    直接存储；其余文件在线程池中各自 deflate（zlib 压缩时释放 GIL），再由当前线程
+    按顺序追加到 zip。ZipFile 内部实现未经验证的 Python 版本上退回逐个 zf.write。
+    """
+    written = 0
+    # 超出范围的级别会让每个条目都因 zlib.error 被跳过，截断到 zlib 支持的范围内
+    low, high = _LEVEL_RANGE
+    compresslevel = max(low, min(high, compresslevel))
+
+    with zipfile.ZipFile(
+        zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+    ) as zf:
+        if not _supports_precompressed(zf):
+            for path, arcname in files:
+                try:
+                    compress_type = (
+                        zipfile.ZIP_STORED
+                        if path.endswith(COMPRESSED_SUFFIXES)
+                        else None
+                    )
+                    zf.write(path, arcname, compress_type=compress_type)
+                    written += 1
+                except Exception:
+                    pass
+            return written
+
+        workers = max(1, min(len(files), os.cpu_count() or 1))
+        # 限制排队的条目数量和预压缩数据的总大小
+        window = workers * 2
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="logplus_zip"
+        ) as pool:
+            # (路径, 包内路径, ZipInfo, 预压缩任务或 None, 原始大小)
+            pending = deque()
+            pending_bytes = 0
+
+            def write_next() -> int:
+                nonlocal pending_bytes
+                path, arcname, zinfo, future, size = pending.popleft()
+                pending_bytes -= size
+                try:
+                    if future is None:
+                        # 已压缩或过大的文件，按顺序直接写入
+                        compress_type = (
+                            zipfile.ZIP_STORED
+                            if path.endswith(COMPRESSED_SUFFIXES)
+                            else None
+                        )
+                        zf.write(path, arcname, compress_type=compress_type)
+                        return 1
+                    data, crc, file_size = future.result()
+                except Exception:
+                    return 0
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                zinfo.CRC = crc
+                zinfo.file_size = file_size
+                zinfo.compress_size = len(data)
+                _write_precompressed(zf, zinfo, data)
+                return 1
+
+            for path, arcname in files:
+                future = None
+                size = 0
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+                except Exception:
+                    continue
+                if (
+                    not path.endswith(COMPRESSED_SUFFIXES)
+                    and zinfo.file_size <= _PRECOMPRESS_MAX_SIZE
+                ):
+                    size = zinfo.file_size
+                    while pending and (
+                        len(pending) >= window
+                        or pending_bytes + size > _PENDING_MAX_BYTES
+                    ):
+                        written += write_next()
+                    future = pool.submit(_deflate_file, path, compresslevel)
+
+                pending.append((path, arcname, zinfo, future, size))
+                pending_bytes += size
+
+            while pending:
+                written += write_next()
+
+    return written
@@ -1,4 +1,7 @@
 import asyncio
+import atexit
+import queue
+from logging.handlers import QueueListener
 from pathlib import Path
 from typing import Any
 
@@ -10,7 +13,7 @@ from astrbot.core.message.components import File, Plain
 from .core.command_handler import CommandHandler
 from .core.config_manager import ConfigManager
 from .core.log_cleaner import LogCleaner
-from .core.log_handler import LogPlusHandler
+from .core.log_handler import LogPlusHandler, LogPlusQueueHandler
 from .core.sensitive_filter import SensitiveFilter
 
 LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
@@ -34,6 +37,8 @@ class LogPlusPlugin(Star):
 
         self.config_manager = ConfigManager(config)
         self.log_handler: LogPlusHandler | None = None
+        self.queue_handler: LogPlusQueueHandler | None = None
+        self.log_listener: QueueListener | None = None
         self.log_cleaner: LogCleaner | None = None
         self.sensitive_filter: SensitiveFilter | None = None
         self.command_handler: CommandHandler | None = None
@@ -47,7 +52,11 @@ class LogPlusPlugin(Star):
 
             if config.get("enable_sensitive_filter", True):
                 keywords = self.config_manager.get_sensitive_keywords()
-                self.sensitive_filter = SensitiveFilter(keywords=keywords, enabled=True)
+                self.sensitive_filter = SensitiveFilter(
+                    keywords=keywords,
+                    enabled=True,
+                    matcher=self.config_manager.get_sensitive_matcher(),
+                )
 
             self.log_handler = LogPlusHandler(
                 self.data_dir, config, sensitive_filter=self.sensitive_filter
@@ -57,12 +66,25 @@ class LogPlusPlugin(Star):
             level = LOG_LEVELS.get(level_name, 10)
             self.log_handler.setLevel(level)
 
-            logger.addHandler(self.log_handler)
+            # 调用方只负责入队，脱敏与写文件由监听线程完成
+            log_queue = queue.SimpleQueue()
+            self.queue_handler = LogPlusQueueHandler(log_queue)
+            self.queue_handler.setLevel(level)
+            self.log_listener = QueueListener(
+                log_queue, self.log_handler, respect_handler_level=True
+            )
+            self.log_listener.start()
+            # 进程未调用 terminate 直接退出时，也先处理完队列中的日志
+            atexit.register(self._stop_log_listener)
+
+            logger.addHandler(self.queue_handler)
 
             self.log_cleaner = LogCleaner(self.data_dir, config)
             await self.log_cleaner.start()
 
-            self.command_handler = CommandHandler(self.data_dir, self.log_cleaner)
+            self.command_handler = CommandHandler(
+                self.data_dir, self.log_cleaner, config
+            )
 
             logger.info(f"✅ LogPlus 插件已启动，日志目录: {self.data_dir}")
 
@@ -74,12 +96,24 @@ class LogPlusPlugin(Star):
         if self.log_cleaner:
             await self.log_cleaner.stop()
 
+        if self.queue_handler:
+            logger.removeHandler(self.queue_handler)
+
+        # 先停止监听线程，处理完队列中剩余的日志再关闭文件
+        atexit.unregister(self._stop_log_listener)
+        self._stop_log_listener()
+
         if self.log_handler:
-            logger.removeHandler(self.log_handler)
             self.log_handler.close()
 
         logger.info("LogPlus 插件已停止")
 
+    def _stop_log_listener(self):
+        """停止监听线程，处理完队列中剩余的日志"""
+        if self.log_listener:
+            self.log_listener.stop()
+            self.log_listener = None
+
     @filter.command_group("logplus")
     def logplus(self):
         """LogPlus 命令组"""